@@ -15,16 +15,20 @@ Usage:
     --in data/derived/languages_master.csv \
     --out data/derived/languages_master_augmented.csv \
     --missing data/derived/hyperpolyglot_missing_from_master.csv \
-    [--langcol name]
+    [--langcol name] [--no-cache]
 
-Requires: requests, pandas
+Requires: requests, pandas (pyarrow optional, for faster CSV I/O)
 """
-import argparse, re, sys
+import argparse, hashlib, json, pickle, re, sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # GitHub raw (primary)
 GH_LANGUAGES_RS_URL = "https://raw.githubusercontent.com/monkslc/hyperpolyglot/master/src/codegen/languages.rs"
@@ -36,62 +40,113 @@ DRS_LANGUAGE_INFO_MAP_URL = "https://docs.rs/crate/hyperpolyglot/latest/source/s
 
 UA = {"User-Agent": "augment-languages/1.0 (+https://example.invalid)", "Accept": "text/plain,*/*;q=0.1"}
 
+# One pooled keep-alive session (with retries) for every fetch in this script
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))))
+
+# Fetched sources are kept here and revalidated with conditional GETs (disable with --no-cache)
+CACHE_DIR = Path("data/.cache")
+
+# Compiled once; normalize_key runs for every row, alias and variant.
+WS_RE = re.compile(r"\s+")
+KEY_STRIP_RE = re.compile(r"[^a-z0-9+#.\- ]+")
+PUNCT_TR = str.maketrans({"–": "-", "—": "-", "’": "'", "“": '"', "”": '"'})
+LANG_BLOCK_RE = re.compile(r"static\s+LANGUAGES\s*:[\s\S]*?=\s*&\s*\[(?P<body>[\s\S]*?)\]\s*;")
+LANG_ITEM_RE = re.compile(r'"((?:\\.|[^"\\])*)"')
+LANG_INFO_RE = re.compile(
+    r'\("(?P<key>[^"]+)",\s*Language\s*\{\s*name:\s*"(?P<name>[^"]+)",\s*'
+    r'language_type:\s*LanguageType::(?P<ltype>\w+),\s*'
+    r'color:\s*(?:Some\("?(?P<color>#?[0-9A-Fa-f]+)"?\)|None),\s*'
+    r'group:\s*(?:Some\("(?P<group>.*?)"\)|None)\s*\}\s*\)',
+    re.S)
+
 def normalize_token(s: str) -> str:
     s = (s or "").strip()
-    s = s.replace("–", "-").replace("—", "-").replace("’", "'").replace("“", '"').replace("”", '"')
-    s = re.sub(r"\s+", " ", s)
+    s = s.translate(PUNCT_TR)
+    s = WS_RE.sub(" ", s)
     return s
 
+# names repeat across rows and variants, so keys are memoized
+@lru_cache(maxsize=16384)
 def normalize_key(s: str) -> str:
     s = normalize_token(s).lower()
-    s = re.sub(r"[^a-z0-9+#.\- ]+", "", s)
+    s = KEY_STRIP_RE.sub("", s)
     s = s.strip()
     return s
 
-def builtin_alias_table() -> Dict[str,str]:
-    return {
-        "c sharp": "C#", "c-sharp": "C#", "csharp": "C#", "cs": "C#", "c#": "C#",
-        "f sharp": "F#", "f-sharp": "F#", "fsharp": "F#", "f#": "F#",
-        "objective c": "Objective-C", "objective-c": "Objective-C", "obj-c": "Objective-C",
-        "objective c++": "Objective-C++", "objective-c++": "Objective-C++", "obj-c++": "Objective-C++",
-        "c plus plus": "C++", "cplusplus": "C++", "cpp": "C++", "c++": "C++",
-        "c language": "C", "golang": "Go",
-        "tsql": "TSQL", "t-sql": "TSQL", "microsoft tsql": "TSQL",
-        "pl/sql": "PLSQL", "pl-sql": "PLSQL", "plsql": "PLSQL",
-        "pl/pgsql": "PLpgSQL", "plpgsql": "PLpgSQL",
-        "cmd": "Batchfile", "dos batch": "Batchfile", "batch": "Batchfile",
-        "powershell core": "PowerShell", "windows powershell": "PowerShell", "ps": "PowerShell",
-        "z shell": "Shell", "zsh": "Shell", "bash": "Shell", "fish shell": "fish",
-        "shell script": "Shell", "unix shell": "Shell", "posix shell": "Shell",
-        "html5": "HTML", "html+php": "HTML+PHP", "html+erb": "HTML+ERB", "html+ecr": "HTML+ECR", "html+django": "HTML+Django",
-        "scss": "SCSS", "sass": "Sass", "less": "Less", "stylus": "Stylus",
-        "js": "JavaScript", "javascript": "JavaScript", "ts": "TypeScript", "tsx": "TSX", "jsx": "JSX",
-        "pug": "Pug", "jade": "Pug", "handlebars": "Handlebars", "hbs": "Handlebars", "mustache": "Handlebars",
-        "xml plist": "XML Property List", "plist": "XML Property List",
-        "yaml": "YAML", "yml": "YAML", "toml": "TOML", "json5": "JSON5", "jsonc": "JSON with Comments",
-        "cson": "CSON", "ini": "INI", "editorconfig": "EditorConfig",
-        "llvm ir": "LLVM", "llvm": "LLVM",
-        "nimlang": "Nim", "ocaml": "OCaml", "objective caml": "OCaml",
-        "rkt": "Racket", "clj": "Clojure", "cljc": "Clojure", "cljs": "Clojure",
-        "elisp": "Emacs Lisp", "emacs-lisp": "Emacs Lisp",
-        "matlab": "MATLAB", "wolfram": "Mathematica", "wolfram language": "Mathematica",
-        "rstats": "R", "stata": "Stata", "apl": "APL", "j language": "J",
-        "vhdl": "VHDL", "verilog": "Verilog", "systemverilog": "SystemVerilog",
-        "hlsl": "HLSL", "glsl": "GLSL",
-        "vb": "Visual Basic .NET", "vb.net": "Visual Basic .NET", "vba": "VBA",
-        "k8s manifest": "YAML", "cuda": "Cuda",
-        "plain text": "Text", "markdown": "Markdown", "md": "Markdown",
-        "fstar": "F*",
-    }
-
-def http_get_plain(urls: List[str]) -> str:
+BUILTIN_ALIASES = {
+    "c sharp": "C#", "c-sharp": "C#", "csharp": "C#", "cs": "C#", "c#": "C#",
+    "f sharp": "F#", "f-sharp": "F#", "fsharp": "F#", "f#": "F#",
+    "objective c": "Objective-C", "objective-c": "Objective-C", "obj-c": "Objective-C",
+    "objective c++": "Objective-C++", "objective-c++": "Objective-C++", "obj-c++": "Objective-C++",
+    "c plus plus": "C++", "cplusplus": "C++", "cpp": "C++", "c++": "C++",
+    "c language": "C", "golang": "Go",
+    "tsql": "TSQL", "t-sql": "TSQL", "microsoft tsql": "TSQL",
+    "pl/sql": "PLSQL", "pl-sql": "PLSQL", "plsql": "PLSQL",
+    "pl/pgsql": "PLpgSQL", "plpgsql": "PLpgSQL",
+    "cmd": "Batchfile", "dos batch": "Batchfile", "batch": "Batchfile",
+    "powershell core": "PowerShell", "windows powershell": "PowerShell", "ps": "PowerShell",
+    "z shell": "Shell", "zsh": "Shell", "bash": "Shell", "fish shell": "fish",
+    "shell script": "Shell", "unix shell": "Shell", "posix shell": "Shell",
+    "html5": "HTML", "html+php": "HTML+PHP", "html+erb": "HTML+ERB", "html+ecr": "HTML+ECR", "html+django": "HTML+Django",
+    "scss": "SCSS", "sass": "Sass", "less": "Less", "stylus": "Stylus",
+    "js": "JavaScript", "javascript": "JavaScript", "ts": "TypeScript", "tsx": "TSX", "jsx": "JSX",
+    "pug": "Pug", "jade": "Pug", "handlebars": "Handlebars", "hbs": "Handlebars", "mustache": "Handlebars",
+    "xml plist": "XML Property List", "plist": "XML Property List",
+    "yaml": "YAML", "yml": "YAML", "toml": "TOML", "json5": "JSON5", "jsonc": "JSON with Comments",
+    "cson": "CSON", "ini": "INI", "editorconfig": "EditorConfig",
+    "llvm ir": "LLVM", "llvm": "LLVM",
+    "nimlang": "Nim", "ocaml": "OCaml", "objective caml": "OCaml",
+    "rkt": "Racket", "clj": "Clojure", "cljc": "Clojure", "cljs": "Clojure",
+    "elisp": "Emacs Lisp", "emacs-lisp": "Emacs Lisp",
+    "matlab": "MATLAB", "wolfram": "Mathematica", "wolfram language": "Mathematica",
+    "rstats": "R", "stata": "Stata", "apl": "APL", "j language": "J",
+    "vhdl": "VHDL", "verilog": "Verilog", "systemverilog": "SystemVerilog",
+    "hlsl": "HLSL", "glsl": "GLSL",
+    "vb": "Visual Basic .NET", "vb.net": "Visual Basic .NET", "vba": "VBA",
+    "k8s manifest": "YAML", "cuda": "Cuda",
+    "plain text": "Text", "markdown": "Markdown", "md": "Markdown",
+    "fstar": "F*",
+}
+
+def decode_body(r: requests.Response) -> str:
+    # declared charset or UTF-8; skips requests' chardet guess behind r.text
+    return r.content.decode(r.encoding or "utf-8", errors="replace")
+
+def get_text_cached(url: str, headers: Dict[str, str], timeout: int, use_cache: bool = True) -> str:
+    """GET url as text, revalidating an on-disk copy with ETag/Last-Modified (304 -> cached body)."""
+    if not use_cache:
+        r = SESSION.get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        return decode_body(r)
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    body_p, meta_p = CACHE_DIR / f"{key}.body", CACHE_DIR / f"{key}.json"
+    meta = json.loads(meta_p.read_text(encoding="utf-8")) if body_p.exists() and meta_p.exists() else {}
+    cond = dict(headers)
+    if meta.get("etag"):
+        cond["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        cond["If-Modified-Since"] = meta["last_modified"]
+    r = SESSION.get(url, headers=cond, timeout=timeout)
+    if r.status_code == 304 and meta:
+        return body_p.read_text(encoding="utf-8")
+    r.raise_for_status()
+    text = decode_body(r)
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if etag or last_modified:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        body_p.write_text(text, encoding="utf-8")
+        meta_p.write_text(json.dumps({"url": url, "etag": etag, "last_modified": last_modified}), encoding="utf-8")
+    return text
+
+def http_get_plain(urls: List[str], use_cache: bool = True) -> str:
     last_err = None
     for url in urls:
         try:
-            r = requests.get(url, headers=UA, timeout=30)
-            r.raise_for_status()
-            txt = r.text
-            if "<html" in txt.lower():
+            txt = get_text_cached(url, UA, 30, use_cache)
+            if "<html" in txt[:4096].lower():
                 # Not plain; skip
                 last_err = RuntimeError(f"Received HTML from {url}")
                 continue
@@ -101,37 +156,50 @@ def http_get_plain(urls: List[str]) -> str:
             continue
     raise RuntimeError(f"Failed to fetch plain source from all candidates. Last error: {last_err}")
 
+def cached_parse(tag: str, src: str, parse, use_cache: bool = True):
+    """Memoize parse(src) as a pickle keyed by the hash of src and of this script."""
+    if not use_cache:
+        return parse(src)
+    h = hashlib.sha1(src.encode("utf-8") + Path(__file__).read_bytes()).hexdigest()[:16]
+    p = CACHE_DIR / f"{tag}_{h}.pkl"
+    if p.exists():
+        try:
+            with p.open("rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # unreadable cache -> re-parse
+    out = parse(src)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with p.open("wb") as f:
+        pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+    for stale in CACHE_DIR.glob(f"{tag}_" + "[0-9a-f]" * 16 + ".pkl"):
+        if stale != p:
+            stale.unlink(missing_ok=True)  # superseded source or script version
+    return out
+
+def read_csv(path) -> pd.DataFrame:
+    """Read a CSV with the pyarrow engine when available (same frame, parsed multithreaded)."""
+    try:
+        return pd.read_csv(path, engine="pyarrow")
+    except (ImportError, ValueError):  # pyarrow missing, or a file it can't parse
+        return pd.read_csv(path)
+
 def slice_languages_block(text: str) -> str:
-    m = re.search(r"static\s+LANGUAGES\s*:[\s\S]*?=\s*&\s*\[(?P<body>[\s\S]*?)\]\s*;", text)
+    m = LANG_BLOCK_RE.search(text)
     if not m:
         raise RuntimeError("Could not locate LANGUAGES array in languages.rs")
     return m.group("body")
 
 def parse_languages_rs(text: str) -> List[str]:
     body = slice_languages_block(text)
-    items = re.findall(r'"((?:\\.|[^"\\])*)"', body)
+    items = LANG_ITEM_RE.findall(body)
     return [i.encode("utf-8").decode("unicode_escape") for i in items]
 
 def parse_language_info_map(text: str) -> Dict[str, Dict[str, Optional[str]]]:
     out = {}
-    pattern = re.compile(
-        r'\("(?P<key>[^"]+)",\s*Language\s*\{\s*name:\s*"(?P<name>[^"]+)",\s*'
-        r'language_type:\s*LanguageType::(?P<ltype>\w+),\s*'
-        r'color:\s*(?P<color>Some\("?#?[0-9A-Fa-f]+"?\)|None),\s*'
-        r'group:\s*(?P<group>Some\(".*?"\)|None)\s*\}\s*\)',
-        re.S)
-    for m in pattern.finditer(text):
-        name = m.group("name")
-        ltype = m.group("ltype")
-        color_raw = m.group("color")
-        group_raw = m.group("group")
-        color = None
-        if color_raw.startswith("Some"):
-            color = re.search(r'"(#?[0-9A-Fa-f]+)"', color_raw).group(1)
-        group = None
-        if group_raw.startswith("Some"):
-            group = re.search(r'"(.*?)"', group_raw).group(1)
-        out[name] = {"hp_type": ltype, "hp_color": color, "hp_group": group}
+    for m in LANG_INFO_RE.finditer(text):
+        # color/group are None when the source says None
+        out[m.group("name")] = {"hp_type": m.group("ltype"), "hp_color": m.group("color"), "hp_group": m.group("group")}
     return out
 
 def build_index(hp_list: List[str]) -> Dict[str, str]:
@@ -161,37 +229,38 @@ def main():
     ap.add_argument("--out", dest="out_csv", default="data/derived/languages_master_augmented.csv", help="Output augmented CSV path")
     ap.add_argument("--missing", dest="missing_csv", default="data/derived/hyperpolyglot_missing_from_master.csv", help="Output 'missing from master' CSV path")
     ap.add_argument("--langcol", dest="langcol", default=None, help="Language name column in input CSV (optional)")
+    ap.add_argument("--no-cache", dest="use_cache", action="store_false", help="Always re-download sources (skip data/.cache)")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.in_csv)
+    df = read_csv(args.in_csv)
     lang_col = args.langcol
     if not lang_col:
         candidates = [c for c in df.columns if normalize_key(c) in {"language", "lang", "name", "language_name", "programming_language"}]
         lang_col = candidates[0] if candidates else df.columns[0]
 
-    # Fetch languages.rs and language-info-map.rs (GitHub raw, then docs.rs fallback)
-    languages_rs = http_get_plain([GH_LANGUAGES_RS_URL, DRS_LANGUAGES_RS_URL])
-    language_info_rs = http_get_plain([GH_LANGUAGE_INFO_MAP_URL, DRS_LANGUAGE_INFO_MAP_URL])
+    # Fetch languages.rs and language-info-map.rs concurrently (GitHub raw, then docs.rs fallback)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_languages = ex.submit(http_get_plain, [GH_LANGUAGES_RS_URL, DRS_LANGUAGES_RS_URL], args.use_cache)
+        f_language_info = ex.submit(http_get_plain, [GH_LANGUAGE_INFO_MAP_URL, DRS_LANGUAGE_INFO_MAP_URL], args.use_cache)
+        languages_rs, language_info_rs = f_languages.result(), f_language_info.result()
 
-    hp_list = parse_languages_rs(languages_rs)
-    info_map = parse_language_info_map(language_info_rs)
+    hp_list = cached_parse("hp_languages", languages_rs, parse_languages_rs, args.use_cache)
+    info_map = cached_parse("hp_language_info", language_info_rs, parse_language_info_map, args.use_cache)
 
     idx = build_index(hp_list)
-    alias_map = builtin_alias_table()
 
-    df["hyperpolyglot_name"] = df[lang_col].map(lambda x: to_hp_canonical(str(x), idx, alias_map))
+    df["hyperpolyglot_name"] = df[lang_col].map(lambda x: to_hp_canonical(str(x), idx, BUILTIN_ALIASES))
     df["in_hyperpolyglot"] = df["hyperpolyglot_name"].notna()
-    df["hp_type"]  = df["hyperpolyglot_name"].map(lambda n: info_map.get(n, {}).get("hp_type") if n else None)
-    df["hp_group"] = df["hyperpolyglot_name"].map(lambda n: info_map.get(n, {}).get("hp_group") if n else None)
-    df["hp_color"] = df["hyperpolyglot_name"].map(lambda n: info_map.get(n, {}).get("hp_color") if n else None)
+    info_frame = pd.DataFrame.from_dict(info_map, orient="index", columns=["hp_type", "hp_group", "hp_color"])
+    hp_info = info_frame.reindex(df["hyperpolyglot_name"])
+    for col in info_frame.columns:
+        df[col] = hp_info[col].to_numpy()
 
     Path(args.out_csv).parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(args.out_csv, index=False)
 
-    hp_set = set(hp_list)
-    master_canon = set([n for n in df["hyperpolyglot_name"].dropna().unique()])
-    missing = sorted(hp_set - master_canon)
-    pd.DataFrame({"hyperpolyglot_only": missing}).to_csv(args.missing_csv, index=False)
+    missing = pd.Index(hp_list).difference(df["hyperpolyglot_name"].dropna().unique())
+    missing.to_frame(index=False, name="hyperpolyglot_only").to_csv(args.missing_csv, index=False)
 
     print(f"[done] Augmented rows matched: {df['in_hyperpolyglot'].sum()} / {len(df)}")
     print(f"[done] Wrote: {args.out_csv}")
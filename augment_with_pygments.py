@@ -32,64 +32,144 @@ Usage:
     --out data/derived/languages_master_augmented_pygments.csv \
     --missing data/derived/pygments_missing_from_master.csv \
     [--langcol name] \
-    [--extcols extensions,filenames]
+    [--extcols extensions,filenames] \
+    [--chunksize 50000] [--no-cache] [--parquet]
 
-Requires: requests, pandas
+Requires: requests, pandas (pyarrow optional, for --parquet)
 """
 from __future__ import annotations
 
-import argparse, ast, re, sys
+import argparse, ast, hashlib, json, pickle, re, sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Iterable
+from typing import Dict, List, NamedTuple, Optional, Tuple, Iterable
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only used for --parquet
+    pa = None
 
 PYGMENTS_MAPPING_URL = "https://raw.githubusercontent.com/pygments/pygments/master/pygments/lexers/_mapping.py"
 
+# One pooled keep-alive session (with retries) for every fetch in this script
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))))
+
+# Fetched sources are kept here and revalidated with conditional GETs (disable with --no-cache)
+CACHE_DIR = Path("data/.cache")
+
+# Compiled once; normalize_key runs for every row, alias and variant.
+WS_RE = re.compile(r"\s+")
+KEY_STRIP_RE = re.compile(r"[^a-z0-9+#.\- ]+")
+PUNCT_TR = str.maketrans({"–": "-", "—": "-", "’": "'", "“": '"', "”": '"'})
+STAR_EXT_RE = re.compile(r'^\*\.(?P<ext>[A-Za-z0-9_+\-\.]+)$')
+EXT_SPLIT_RE = re.compile(r"[,\s;|]+")
+LEXERS_RE = re.compile(r"^LEXERS\s*=\s*(\{.*?\n\})", re.S | re.M)
+
 # --------------------------- Normalization ---------------------------
 
 def normalize_token(s: str) -> str:
     s = (s or "").strip()
-    s = s.replace("–", "-").replace("—", "-").replace("’", "'").replace("“", '"').replace("”", '"')
-    s = re.sub(r"\s+", " ", s)
+    s = s.translate(PUNCT_TR)
+    s = WS_RE.sub(" ", s)
     return s
 
+# names repeat across rows and variants, so keys are memoized
+@lru_cache(maxsize=16384)
 def normalize_key(s: str) -> str:
     s = normalize_token(s).lower()
-    s = re.sub(r"[^a-z0-9+#.\- ]+", "", s)
+    s = KEY_STRIP_RE.sub("", s)
     s = s.strip()
     return s
 
-def builtin_alias_table() -> Dict[str,str]:
-    return {
-        "c sharp": "csharp", "c-sharp": "csharp", "c#": "csharp",
-        "f sharp": "fsharp", "f-sharp": "fsharp", "f#": "fsharp",
-        "c plus plus": "cpp", "cplusplus": "cpp", "c++": "cpp", "cpp": "cpp",
-        "objective c": "objective-c", "objective-c": "objective-c", "obj-c": "objective-c",
-        "objective c++": "objective-c++", "objective-c++": "objective-c++", "obj-c++": "objective-c++",
-        "golang": "go",
-        "js": "javascript", "ts": "typescript",
-        "vb.net": "vbnet", "vb": "vbnet", "visual basic": "vbnet",
-        "ocaml": "ocaml", "objective caml": "ocaml",
-        "shell": "bash", "shell script": "bash", "unix shell": "bash",
-        "wolfram language": "mathematica", "wolfram": "mathematica",
-        "rstats": "r",
-        "yaml": "yaml", "yml": "yaml",
-        "jsonc": "json", "json5": "json",
-        "pl/sql": "plsql", "pl-sql": "plsql", "plpgsql": "postgresql",
-        "powershell": "powershell",
-        "vim script": "viml", "vimscript": "viml",
-    }
+BUILTIN_ALIASES = {
+    "c sharp": "csharp", "c-sharp": "csharp", "c#": "csharp",
+    "f sharp": "fsharp", "f-sharp": "fsharp", "f#": "fsharp",
+    "c plus plus": "cpp", "cplusplus": "cpp", "c++": "cpp", "cpp": "cpp",
+    "objective c": "objective-c", "objective-c": "objective-c", "obj-c": "objective-c",
+    "objective c++": "objective-c++", "objective-c++": "objective-c++", "obj-c++": "objective-c++",
+    "golang": "go",
+    "js": "javascript", "ts": "typescript",
+    "vb.net": "vbnet", "vb": "vbnet", "visual basic": "vbnet",
+    "ocaml": "ocaml", "objective caml": "ocaml",
+    "shell": "bash", "shell script": "bash", "unix shell": "bash",
+    "wolfram language": "mathematica", "wolfram": "mathematica",
+    "rstats": "r",
+    "yaml": "yaml", "yml": "yaml",
+    "jsonc": "json", "json5": "json",
+    "pl/sql": "plsql", "pl-sql": "plsql", "plpgsql": "postgresql",
+    "powershell": "powershell",
+    "vim script": "viml", "vimscript": "viml",
+}
 
 # --------------------------- Fetch & Parse Pygments ---------------------------
 
-def fetch_text(url: str) -> str:
-    r = requests.get(url, headers={"Accept": "text/plain"}, timeout=45)
+def decode_body(r: requests.Response) -> str:
+    # declared charset or UTF-8; skips requests' chardet guess behind r.text
+    return r.content.decode(r.encoding or "utf-8", errors="replace")
+
+def get_text_cached(url: str, headers: Dict[str, str], timeout: int, use_cache: bool = True) -> str:
+    """GET url as text, revalidating an on-disk copy with ETag/Last-Modified (304 -> cached body)."""
+    if not use_cache:
+        r = SESSION.get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        return decode_body(r)
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    body_p, meta_p = CACHE_DIR / f"{key}.body", CACHE_DIR / f"{key}.json"
+    meta = json.loads(meta_p.read_text(encoding="utf-8")) if body_p.exists() and meta_p.exists() else {}
+    cond = dict(headers)
+    if meta.get("etag"):
+        cond["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        cond["If-Modified-Since"] = meta["last_modified"]
+    r = SESSION.get(url, headers=cond, timeout=timeout)
+    if r.status_code == 304 and meta:
+        return body_p.read_text(encoding="utf-8")
     r.raise_for_status()
-    return r.text
+    text = decode_body(r)
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if etag or last_modified:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        body_p.write_text(text, encoding="utf-8")
+        meta_p.write_text(json.dumps({"url": url, "etag": etag, "last_modified": last_modified}), encoding="utf-8")
+    return text
+
+def fetch_text(url: str, use_cache: bool = True) -> str:
+    return get_text_cached(url, {"Accept": "text/plain"}, 45, use_cache)
+
+def walk_lexers_dict(node: ast.AST) -> Dict[str, Tuple[str, str, List[str], List[str], List[str]]]:
+    """Read the LEXERS dict literal straight off the AST (all entries are string constants)."""
+    def s(n: ast.AST) -> str:
+        if not (isinstance(n, ast.Constant) and isinstance(n.value, str)):
+            raise TypeError("not a string constant")
+        return n.value
+
+    if not isinstance(node, ast.Dict):
+        raise TypeError("LEXERS is not a dict literal")
+    out = {}
+    for k, v in zip(node.keys, node.values):
+        mod, cls, aliases, filenames, mimetypes = v.elts
+        out[s(k)] = (s(mod), s(cls),
+                     [s(a) for a in aliases.elts],
+                     [s(f) for f in filenames.elts],
+                     [s(m) for m in mimetypes.elts])
+    return out
 
 def extract_lexers_mapping(src_text: str) -> Dict[str, Tuple[str, str, List[str], List[str], List[str]]]:
+    # Fast path: parse only the LEXERS = {...} literal instead of the whole module
+    m = LEXERS_RE.search(src_text)
+    if m:
+        try:
+            return walk_lexers_dict(ast.parse(m.group(1), mode="eval").body)
+        except (SyntaxError, AttributeError, TypeError, ValueError):
+            pass  # unusual layout -> full module parse below
     tree = ast.parse(src_text, filename="_mapping.py", mode="exec")
     lexers_node = None
     for node in tree.body:
@@ -100,6 +180,10 @@ def extract_lexers_mapping(src_text: str) -> Dict[str, Tuple[str, str, List[str]
                     break
     if lexers_node is None:
         raise RuntimeError("Could not find LEXERS assignment in _mapping.py")
+    try:
+        return walk_lexers_dict(lexers_node)
+    except (AttributeError, TypeError, ValueError):
+        pass  # not the usual plain-literal layout -> generic (slower) path below
     lexers = ast.literal_eval(lexers_node)
     out = {}
     for disp, tup in lexers.items():
@@ -110,16 +194,57 @@ def extract_lexers_mapping(src_text: str) -> Dict[str, Tuple[str, str, List[str]
                           [str(m) for m in mimetypes])
     return out
 
+def cached_parse(tag: str, src: str, parse, use_cache: bool = True):
+    """Memoize parse(src) as a pickle keyed by the hash of src and of this script."""
+    if not use_cache:
+        return parse(src)
+    h = hashlib.sha1(src.encode("utf-8") + Path(__file__).read_bytes()).hexdigest()[:16]
+    p = CACHE_DIR / f"{tag}_{h}.pkl"
+    if p.exists():
+        try:
+            with p.open("rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # unreadable cache -> re-parse
+    out = parse(src)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with p.open("wb") as f:
+        pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+    for stale in CACHE_DIR.glob(f"{tag}_" + "[0-9a-f]" * 16 + ".pkl"):
+        if stale != p:
+            stale.unlink(missing_ok=True)  # superseded source or script version
+    return out
+
+def read_csv(path) -> pd.DataFrame:
+    """Read a CSV with the pyarrow engine when available (same frame, parsed multithreaded)."""
+    try:
+        return pd.read_csv(path, engine="pyarrow")
+    except (ImportError, ValueError):  # pyarrow missing, or a file it can't parse
+        return pd.read_csv(path)
+
+def write_csv(df: pd.DataFrame, path, append: bool = False) -> None:
+    """Write df as CSV (pandas formatting, which the published files use); append skips the header."""
+    df.to_csv(path, mode="a" if append else "w", header=not append, index=False)
+
 # --------------------------- Indexes ---------------------------
 
+class PygMeta(NamedTuple):
+    module: str
+    cls: str
+    aliases: Tuple[str, ...]
+    filenames: Tuple[str, ...]
+    mimetypes: Tuple[str, ...]
+
+META_COLUMNS = ["pygments_module", "pygments_class", "pygments_aliases", "pygments_filenames", "pygments_mimetypes"]
+
 def build_pygments_indexes(lexers):
     """
     Returns:
-      - name2meta: display-name -> meta
+      - name2meta: display-name -> PygMeta
       - alias_index: normalized token -> display-name (display-name & aliases)
-      - fname_index: filename/ext token -> set(display-name)
+      - fname_index: filename/ext token -> sorted tuple of display-names
     """
-    name2meta = {}
+    name2meta: Dict[str, PygMeta] = {}
     alias_index: Dict[str, str] = {}
     fname_index: Dict[str, set] = {}
 
@@ -137,15 +262,7 @@ def build_pygments_indexes(lexers):
         fname_index.setdefault(tok, set()).add(disp)
 
     for disp, (mod, cls, aliases, filenames, mimetypes) in lexers.items():
-        meta = {
-            "pygments_name": disp,
-            "pygments_module": mod,
-            "pygments_class": cls,
-            "pygments_aliases": aliases,
-            "pygments_filenames": filenames,
-            "pygments_mimetypes": mimetypes,
-        }
-        name2meta[disp] = meta
+        name2meta[disp] = PygMeta(mod, cls, tuple(aliases), tuple(filenames), tuple(mimetypes))
 
         # Index display-name and aliases
         nk = normalize_key(disp)
@@ -161,7 +278,7 @@ def build_pygments_indexes(lexers):
             p = pat.strip()
             if not p:
                 continue
-            m = re.match(r'^\*\.(?P<ext>[A-Za-z0-9_+\-\.]+)$', p)
+            m = STAR_EXT_RE.match(p)
             if m:
                 add_fname_token("." + m.group("ext").lower().lstrip("."), disp)
             else:
@@ -169,24 +286,37 @@ def build_pygments_indexes(lexers):
                 add_fname_token(bare, disp)
                 add_fname_token(bare.lstrip("_."), disp)
 
+    # frozen once built; the greatest name is the heuristic's pick for a token
+    fname_index = {tok: tuple(sorted(names)) for tok, names in fname_index.items()}
     return name2meta, alias_index, fname_index
 
+def build_meta_frame(name2meta) -> pd.DataFrame:
+    """One row per display-name holding the output pygments_* columns (lists ;-joined)."""
+    meta = pd.DataFrame(list(name2meta.values()), index=list(name2meta), columns=list(PygMeta._fields))
+    meta.columns = META_COLUMNS
+    for c in ("pygments_aliases", "pygments_filenames", "pygments_mimetypes"):
+        meta[c] = meta[c].map(";".join)
+    return meta
+
 # --------------------------- Matching ---------------------------
 
-def pick_master_name(row, candidates: List[str]) -> str:
-    if "hyperpolyglot_name" in row and pd.notna(row["hyperpolyglot_name"]) and str(row["hyperpolyglot_name"]).strip():
-        return str(row["hyperpolyglot_name"])
-    for c in candidates:
-        if c in row and pd.notna(row[c]) and str(row[c]).strip():
-            return str(row[c])
-    return ""
+def pick_master_names(df: pd.DataFrame, candidates: List[str]) -> pd.Series:
+    """First non-blank candidate column per row ("" if none), column-wise."""
+    names = pd.Series("", index=df.index, dtype=object)
+    for c in reversed(candidates):
+        if c not in df.columns:
+            continue
+        vals = df[c]
+        text = vals.astype(str)
+        names = text.where(vals.notna() & (text.str.strip() != ""), names)
+    return names
 
 def split_ext_tokens(val: str) -> Iterable[str]:
     if not val or not isinstance(val, str):
         return []
     # tokens like ".vim", "vimrc", "*.vim" -> ".vim"
     # Split on whitespace or commas/semicolons
-    rough = re.split(r"[,\s;|]+", val.strip())
+    rough = EXT_SPLIT_RE.split(val.strip())
     for t in rough:
         t = t.strip()
         if not t:
@@ -195,11 +325,11 @@ def split_ext_tokens(val: str) -> Iterable[str]:
             t = "." + t[2:]
         yield t
 
-def gather_row_ext_tokens(row, extcols: List[str]) -> List[str]:
+def gather_ext_tokens(values: Iterable) -> List[str]:
     tokens = []
-    for col in extcols:
-        if col in row and pd.notna(row[col]):
-            for t in split_ext_tokens(str(row[col])):
+    for val in values:
+        if pd.notna(val):
+            for t in split_ext_tokens(str(val)):
                 tokens.append(t.lower())
     return tokens
 
@@ -213,25 +343,35 @@ def autodetect_extcols(columns: List[str]) -> List[str]:
             out.append(c); seen.add(c)
     return out
 
-def match_to_pygments(name: str, row_ext_tokens: List[str], alias_index: Dict[str,str], fname_index: Dict[str,set], builtin_aliases: Dict[str,str]) -> Optional[str]:
-    key = normalize_key(name)
-    if key in alias_index:
-        return alias_index[key]
-    if key in builtin_aliases:
-        alt = normalize_key(builtin_aliases[key])
-        if alt in alias_index:
-            return alias_index[alt]
+def match_names_to_pygments(names: pd.Series, alias_index: Dict[str,str]) -> pd.Series:
+    """Name/alias match for a whole column; NaN where nothing matched."""
+    keys = names.map(normalize_key)
+    direct = keys.map(alias_index)
+    via_builtin = keys.map(BUILTIN_ALIASES).map(normalize_key, na_action="ignore").map(alias_index)
+    return direct.fillna(via_builtin)
 
+def match_by_filename(row_ext_tokens: List[str], fname_index: Dict[str,Tuple[str, ...]]) -> Optional[str]:
     # filename/ext heuristic (strict)
-    candidates = []
-    for tok in row_ext_tokens:
-        if tok in fname_index:
-            for disp in fname_index[tok]:
-                candidates.append((len(tok), tok, disp))
-    if candidates:
-        candidates.sort(reverse=True)
-        return candidates[0][2]
-    return None
+    best = max(((len(tok), tok) for tok in row_ext_tokens if tok in fname_index), default=None)
+    return fname_index[best[1]][-1] if best else None
+
+def enrich_chunk(df: pd.DataFrame, candidates: List[str], extcols: List[str], alias_index: Dict[str,str],
+                 fname_index: Dict[str,Tuple[str, ...]], meta_frame: pd.DataFrame) -> pd.DataFrame:
+    # Names for every row at once, filename heuristic only for the misses
+    pyg_matches = match_names_to_pygments(pick_master_names(df, candidates), alias_index).astype(object)
+    unmatched = pyg_matches.isna()
+    present = [c for c in extcols if c in df.columns]
+    if present and unmatched.any():
+        ext_cells = df.loc[unmatched, present]
+        for idx, values in zip(ext_cells.index, ext_cells.itertuples(index=False, name=None)):
+            pyg_matches.at[idx] = match_by_filename(gather_ext_tokens(values), fname_index)
+
+    df["pygments_name"] = pyg_matches
+    df["in_pygments"] = df["pygments_name"].notna()
+    meta = meta_frame.reindex(df["pygments_name"])
+    for c in meta_frame.columns:
+        df[c] = meta[c].to_numpy()
+    return df
 
 # --------------------------- Main ---------------------------
 
@@ -242,52 +382,47 @@ def main():
     ap.add_argument("--missing", dest="missing_csv", default="data/derived/pygments_missing_from_master.csv", help="Output Pygments-only report CSV path")
     ap.add_argument("--langcol", dest="langcol", default=None, help="Language name column in input CSV (optional)")
     ap.add_argument("--extcols", dest="extcols", default=None, help="Comma-separated list of extension/filename columns to use")
+    ap.add_argument("--no-cache", dest="use_cache", action="store_false", help="Always re-download _mapping.py (skip data/.cache)")
+    ap.add_argument("--chunksize", dest="chunksize", type=int, default=50_000, help="Rows per streamed chunk of the input CSV")
+    ap.add_argument("--parquet", action="store_true", help="Also write <out>.parquet for the Rosetta stage (requires pyarrow)")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.in_csv)
-
     # Language column candidates
     candidates = ["hyperpolyglot_name", args.langcol] if args.langcol else ["hyperpolyglot_name", "language", "lang", "name", "language_name", "programming_language"]
     candidates = [c for c in candidates if c is not None]
 
     # Extension columns
-    extcols = [c.strip() for c in args.extcols.split(",")] if args.extcols else autodetect_extcols(list(df.columns))
+    columns = list(pd.read_csv(args.in_csv, nrows=0).columns)
+    extcols = [c.strip() for c in args.extcols.split(",")] if args.extcols else autodetect_extcols(columns)
 
     # Fetch + build indexes
-    mapping_src = fetch_text(PYGMENTS_MAPPING_URL)
-    lexers = extract_lexers_mapping(mapping_src)
-    name2meta, alias_index, fname_index = build_pygments_indexes(lexers)
-    builtin_aliases = builtin_alias_table()
-
-    # Match & enrich
-    pyg_matches: List[Optional[str]] = []
-    for _, row in df.iterrows():
-        master_name = pick_master_name(row, candidates)
-        ext_tokens = gather_row_ext_tokens(row, extcols)
-        pyg_name = match_to_pygments(master_name, ext_tokens, alias_index, fname_index, builtin_aliases)
-        pyg_matches.append(pyg_name)
-
-    df["pygments_name"] = pyg_matches
-    df["in_pygments"] = df["pygments_name"].notna()
-
-    def join_list(v):
-        return ";".join(v) if isinstance(v, list) else None
-
-    df["pygments_module"]    = df["pygments_name"].map(lambda n: name2meta.get(n, {}).get("pygments_module") if n else None)
-    df["pygments_class"]     = df["pygments_name"].map(lambda n: name2meta.get(n, {}).get("pygments_class") if n else None)
-    df["pygments_aliases"]   = df["pygments_name"].map(lambda n: join_list(name2meta.get(n, {}).get("pygments_aliases")) if n else None)
-    df["pygments_filenames"] = df["pygments_name"].map(lambda n: join_list(name2meta.get(n, {}).get("pygments_filenames")) if n else None)
-    df["pygments_mimetypes"] = df["pygments_name"].map(lambda n: join_list(name2meta.get(n, {}).get("pygments_mimetypes")) if n else None)
+    mapping_src = fetch_text(PYGMENTS_MAPPING_URL, args.use_cache)
+    name2meta, alias_index, fname_index = cached_parse(
+        "pygments_indexes", mapping_src,
+        lambda src: build_pygments_indexes(extract_lexers_mapping(src)), args.use_cache)
+    meta_frame = build_meta_frame(name2meta)
 
+    # Stream the input: cells are kept as text so every chunk is written back verbatim
     Path(args.out_csv).parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(args.out_csv, index=False)
-
-    matched = set([m for m in pyg_matches if m])
-    pyg_all = set(name2meta.keys())
-    pyg_only = sorted(pyg_all - matched)
-    pd.DataFrame({"pygments_only": pyg_only}).to_csv(args.missing_csv, index=False)
-
-    print(f"[done] In Pygments matches: {df['in_pygments'].sum()} / {len(df)}")
+    matched: set = set()
+    n_rows = n_matched = 0
+    if args.parquet and pa is None:
+        raise SystemExit("--parquet requires pyarrow")
+    for i, df in enumerate(pd.read_csv(args.in_csv, dtype=str, chunksize=args.chunksize)):
+        df = enrich_chunk(df, candidates, extcols, alias_index, fname_index, meta_frame)
+        write_csv(df, args.out_csv, append=(i > 0))
+        matched.update(df["pygments_name"].dropna())
+        n_rows += len(df)
+        n_matched += int(df["in_pygments"].sum())
+
+    if args.parquet:
+        # typed exactly as the Rosetta stage parses this CSV (chunks above are all text), so either input gives the same frame
+        read_csv(args.out_csv).to_parquet(Path(args.out_csv).with_suffix(".parquet"), index=False, compression="zstd")
+
+    pyg_only = pd.Index(list(name2meta)).difference(list(matched))
+    write_csv(pyg_only.to_frame(index=False, name="pygments_only"), args.missing_csv)
+
+    print(f"[done] In Pygments matches: {n_matched} / {n_rows}")
     print(f"[done] Augmented: {args.out_csv}")
     print(f"[done] Pygments-only report: {args.missing_csv} (count={len(pyg_only)})")
 
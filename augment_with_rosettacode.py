@@ -1,68 +1,66 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import argparse, time, re, difflib
-from typing import Dict, List, Optional
+import argparse, time, re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import pandas as pd
 import requests
+from rapidfuzz import fuzz, process
 
 PRIMARY_API = "https://rosettacode.org/w/api.php"
 FALLBACK_API = "https://rosettacode.org/mw/api.php"
 API_BASES = [PRIMARY_API, FALLBACK_API]
 HEADERS = {"User-Agent": "augment-with-rosettacode/2.1 (+https://example.invalid)"}
-
+WS_RE = re.compile(r"\s+")
+KEY_STRIP_RE = re.compile(r"[^a-z0-9+#.\- ]+")
+PUNCT_TR = str.maketrans({"–":"-","—":"-","’":"'","“":'"',"”":'"'})
+
+try:
+    STRING_DTYPE = pd.StringDtype("pyarrow")  # Arrow-backed .str kernels
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+API_WORKERS = 4  # concurrent batch requests; small enough to stay polite to the wiki
+
+# pure and called on heavily repeated strings (every cell piece), so memoized
+@lru_cache(maxsize=100_000)
 def normalize_token(s: str) -> str:
     s = (s or "").strip()
-    s = s.replace("–","-").replace("—","-").replace("’","'").replace("“",'"').replace("”",'"')
-    s = re.sub(r"\s+"," ",s)
+    s = s.translate(PUNCT_TR)
+    s = WS_RE.sub(" ",s)
     return s
 
+@lru_cache(maxsize=100_000)
 def normalize_key(s: str) -> str:
     s = normalize_token(s).lower()
-    s = re.sub(r"[^a-z0-9+#.\- ]+","",s)
+    s = KEY_STRIP_RE.sub("",s)
     return s.strip()
 
-def alias_map() -> Dict[str,str]:
-    return {
-        "c sharp":"c#", "c-sharp":"c#", "csharp":"c#",
-        "f sharp":"f#","f-sharp":"f#","fsharp":"f#",
-        "c plus plus":"c++","cplusplus":"c++","cpp":"c++",
-        "objective c":"objective-c","obj-c":"objective-c",
-        "objective c++":"objective-c++","obj-c++":"objective-c++",
-        "golang":"go",
-        "js":"javascript","ts":"typescript",
-        "vb.net":"visual basic .net","vb":"visual basic .net","visual basic":"visual basic .net",
-        "ocaml":"ocaml","objective caml":"ocaml",
-        "vim script":"vim script","vimscript":"vim script",
-        "wolfram language":"mathematica","wolfram":"mathematica",
-        "rstats":"r",
-        "yml":"yaml",
-        "jsonc":"json","json5":"json",
-        "pl/sql":"plsql","pl-sql":"plsql",
-        "pl/pgsql":"plpgsql",
-        "powershell":"powershell",
-    }
-
-def _tokenize_pieces(s: str):
-    yield s
-    for sep in [';', ',', '|', '/', '\\']:
-        if sep in s:
-            for part in s.split(sep):
-                part = part.strip()
-                if part:
-                    yield part
-    if any(ch in s for ch in ['_', '-']):
-        for part in re.split(r'[_-]+', s):
-            part = part.strip()
-            if part:
-                yield part
-
-def _variants(key: str):
-    yield key
-    yield key.replace(' ', '-')
-    yield key.replace('-', ' ')
-    yield key.replace(' ', '')
-    yield key.replace('-', '')
+ALIAS_MAP = {
+    "c sharp":"c#", "c-sharp":"c#", "csharp":"c#",
+    "f sharp":"f#","f-sharp":"f#","fsharp":"f#",
+    "c plus plus":"c++","cplusplus":"c++","cpp":"c++",
+    "objective c":"objective-c","obj-c":"objective-c",
+    "objective c++":"objective-c++","obj-c++":"objective-c++",
+    "golang":"go",
+    "js":"javascript","ts":"typescript",
+    "vb.net":"visual basic .net","vb":"visual basic .net","visual basic":"visual basic .net",
+    "ocaml":"ocaml","objective caml":"ocaml",
+    "vim script":"vim script","vimscript":"vim script",
+    "wolfram language":"mathematica","wolfram":"mathematica",
+    "rstats":"r",
+    "yml":"yaml",
+    "jsonc":"json","json5":"json",
+    "pl/sql":"plsql","pl-sql":"plsql",
+    "pl/pgsql":"plpgsql",
+    "powershell":"powershell",
+}
+
+@lru_cache(maxsize=100_000)
+def canonical_key(s: str) -> str:
+    # spaces and dashes dropped, so "c sharp", "c-sharp" and "csharp" share one key
+    return normalize_key(s).replace(" ", "").replace("-", "")
 
 def api_get(params: Dict[str, str]) -> Dict:
     last_exc = None
@@ -78,91 +76,107 @@ def api_get(params: Dict[str, str]) -> Dict:
                 time.sleep(0.3*(attempt+1))
     raise RuntimeError(f"RosettaCode API failed. Last error: {last_exc}")
 
-def list_language_subcategories(root_category: str = "Programming Languages") -> List[str]:
-    titles = []
-    cmcontinue = None
+def api_get_many(param_list: List[Dict[str, str]]) -> List[Dict]:
+    # independent batches in parallel, results in input order
+    with ThreadPoolExecutor(max_workers=API_WORKERS) as ex:
+        return list(ex.map(api_get, param_list))
+
+def list_language_subcategories(root_category: str = "Programming Languages") -> Dict[str,int]:
+    # Subcategory title -> page count; categoryinfo rides along on the generator query
+    counts = {}
+    cont = {}
     while True:
         params = {
             "action": "query",
-            "list": "categorymembers",
-            "cmtitle": f"Category:{root_category}",
-            "cmnamespace": "14",
-            "cmtype": "subcat",
-            "cmlimit": "500",
+            "generator": "categorymembers",
+            "gcmtitle": f"Category:{root_category}",
+            "gcmnamespace": "14",
+            "gcmtype": "subcat",
+            "gcmlimit": "500",
+            "prop": "categoryinfo",
+            **cont,
         }
-        if cmcontinue: params["cmcontinue"] = cmcontinue
         data = api_get(params)
-        for m in data.get("query",{}).get("categorymembers",[]):
-            t = m.get("title")
-            if t: titles.append(t)
-        cmcontinue = data.get("continue",{}).get("cmcontinue")
-        if not cmcontinue: break
+        for pg in data.get("query",{}).get("pages",{}).values():
+            t = pg.get("title")
+            if not t: continue
+            pages = (pg.get("categoryinfo") or {}).get("pages")
+            if pages is not None: counts[t] = int(pages)
+            else: counts.setdefault(t, 0)
+        cont = data.get("continue")
+        if not cont: break
         time.sleep(0.15)
-    return titles
+    return counts
 
 def fetch_extracts(main_titles: List[str]) -> Dict[str,str]:
     out = {}
     BATCH=50
-    for i in range(0,len(main_titles),BATCH):
-        chunk = main_titles[i:i+BATCH]
-        params = {
-            "action":"query", "prop":"extracts", "exintro":"1", "explaintext":"1",
-            "titles":"|".join(chunk),
-        }
-        data = api_get(params)
+    batches = [{
+        "action":"query", "prop":"extracts", "exintro":"1", "explaintext":"1",
+        "titles":"|".join(main_titles[i:i+BATCH]),
+    } for i in range(0,len(main_titles),BATCH)]
+    for data in api_get_many(batches):
         for pg in data.get("query",{}).get("pages",{}).values():
             title = pg.get("title"); extract = pg.get("extract") or ""
             if title: out[title]=extract.strip()
-        time.sleep(0.15)
-    return out
-
-def fetch_categoryinfo_counts(category_titles: List[str]) -> Dict[str,int]:
-    out = {}
-    BATCH=50
-    for i in range(0,len(category_titles),BATCH):
-        chunk = category_titles[i:i+BATCH]
-        params = {
-            "action":"query", "prop":"categoryinfo", "titles":"|".join(chunk),
-        }
-        data = api_get(params)
-        for pg in data.get("query",{}).get("pages",{}).values():
-            t = pg.get("title"); ci = pg.get("categoryinfo") or {}
-            pages = ci.get("pages")
-            if t is not None and pages is not None: out[t]=int(pages)
-        time.sleep(0.15)
     return out
 
-def build_master_index_all_strings(df: pd.DataFrame) -> Dict[str,int]:
-    idx = {}
-    am = alias_map()
-    for ridx, row in df.iterrows():
-        for col in df.columns:
-            val = row[col]
-            if pd.isna(val): continue
-            s = str(val)
-            if not s.strip(): continue
-            for piece in _tokenize_pieces(s):
-                key = normalize_key(piece)
-                if not key: continue
-                for v in _variants(key):
-                    idx.setdefault(v, ridx)
-                ali = am.get(key)
-                if ali:
-                    for v in _variants(ali):
-                        idx.setdefault(v, ridx)
-    return idx
-
-def map_rosetta_to_master(name: str, index: Dict[str,int]) -> Optional[int]:
+def build_master_index_all_strings(df: pd.DataFrame) -> Tuple[Dict[str,int], Dict[str,int]]:
+    # Pieces of every non-blank cell: the whole string, its ;,|/\\ parts and its _/- parts.
+    # Returns (exact, canonical) indexes: each normalize_key/canonical_key of a piece, and of its
+    # alias, maps to the first row that yields it.
+    flat = df.reset_index(drop=True)
+    cells = pd.concat([flat[col].dropna().astype(str) for col in flat.columns])
+    cells = cells[cells.str.strip() != ""]
+    parts = [cells]
+    for sep in [';', ',', '|', '/', '\\']:
+        hit = cells[cells.str.contains(sep, regex=False)]
+        parts.append(hit.str.split(sep, regex=False).explode().str.strip())
+    hit = cells[cells.str.contains(r'[_-]', regex=True)]
+    parts.append(hit.str.split(r'[_-]+', regex=True).explode().str.strip())
+    pieces = pd.concat(parts)
+    pieces = pieces[pieces != ""]
+
+    # normalize each distinct piece once
+    first = pd.DataFrame({"piece": pieces.to_numpy(), "row": pieces.index}).groupby("piece")["row"].min()
+    keys = pd.DataFrame({"key": first.index.map(normalize_key), "row": first.to_numpy()})
+    keys = keys[keys["key"] != ""]
+    ali = keys["key"].map(ALIAS_MAP).dropna()
+    keys = pd.concat([keys, pd.DataFrame({"key": ali, "row": keys.loc[ali.index, "row"]})])
+
+    def first_rows(k: pd.Series) -> Dict[str,int]:
+        best = keys["row"].groupby(k.to_numpy()).min()
+        return dict(zip(best.index, df.index[best.to_numpy()].tolist()))
+    return first_rows(keys["key"]), first_rows(keys["key"].str.replace(" ", "", regex=False).str.replace("-", "", regex=False))
+
+def map_rosetta_to_master(name: str, index: Tuple[Dict[str,int], Dict[str,int]],
+                          candidates: Optional[List[str]] = None) -> Optional[int]:
+    exact, canon = index
     key = normalize_key(name)
-    if key in index: return index[key]
-    ali = alias_map().get(key, key)
-    for v in _variants(ali):
-        if v in index: return index[v]
-    candidates = list(index.keys())
-    best = difflib.get_close_matches(ali, candidates, n=1, cutoff=0.92)
-    if best: return index[best[0]]
+    ali = ALIAS_MAP.get(key, key)
+    for k in (key, ali):
+        if k in exact: return exact[k]
+    # spelling variants ("c sharp" / "c-sharp" / "csharp") all meet on the canonical key
+    ckey = canonical_key(ali)
+    if ckey in canon: return canon[ckey]
+    if candidates is None: candidates = list(canon.keys())
+    best = process.extractOne(ckey, candidates, scorer=fuzz.ratio, score_cutoff=92)
+    if best: return canon[best[0]]
     return None
 
+def read_master(path: str) -> pd.DataFrame:
+    """Load the previous stage: its fresh .parquet sidecar if any, else the CSV (pyarrow engine when available)."""
+    csv_p, side = Path(path), Path(path).with_suffix(".parquet")
+    if side.exists() and (not csv_p.exists() or side.stat().st_mtime >= csv_p.stat().st_mtime):
+        try:
+            return pd.read_parquet(side)
+        except (ImportError, ValueError):
+            pass
+    try:
+        return pd.read_csv(path, engine="pyarrow")
+    except (ImportError, ValueError):
+        return pd.read_csv(path)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_csv", default="data/derived/languages_master_augmented_pygments.csv")
@@ -171,10 +185,10 @@ def main():
     ap.add_argument("--dump", dest="dump_csv", default="data/derived/rosettacode_languages.csv")
     args = ap.parse_args()
 
-    cat_titles = list_language_subcategories("Programming Languages")
+    cat_counts = list_language_subcategories("Programming Languages")
+    cat_titles = list(cat_counts)
     main_titles = [t.split("Category:",1)[1] if t.startswith("Category:") else t for t in cat_titles]
     extracts = fetch_extracts(main_titles)
-    cat_counts = fetch_categoryinfo_counts(cat_titles)
 
     rows = [{"rosettacode_name": mt,
              "rosettacode_url": f"https://rosettacode.org/wiki/{mt.replace(' ','_')}",
@@ -185,7 +199,9 @@ def main():
     Path(args.dump_csv).parent.mkdir(parents=True, exist_ok=True)
     rc_df.to_csv(args.dump_csv, index=False)
 
-    master = pd.read_csv(args.in_csv)
+    master = read_master(args.in_csv)
+    text_cols = [c for c, dt in master.dtypes.items() if dt == object or isinstance(dt, pd.StringDtype)]
+    master[text_cols] = master[text_cols].astype(STRING_DTYPE)
     index = build_master_index_all_strings(master)
 
     if "in_rosettacode" not in master.columns:
@@ -195,19 +211,22 @@ def main():
         if col not in master.columns: master[col]=pd.NA
     if "rosettacode_tasks_count" not in master.columns: master["rosettacode_tasks_count"]=pd.NA
 
-    for _, r in rc_df.iterrows():
-        ridx = map_rosetta_to_master(r["rosettacode_name"], index)
-        if ridx is None: continue
-        master.at[ridx,"in_rosettacode"]=True
-        master.at[ridx,"rosettacode_name"]=r["rosettacode_name"]
-        master.at[ridx,"rosettacode_url"]=r["rosettacode_url"]
-        master.at[ridx,"rosettacode_summary"]=r["rosettacode_summary"]
-        master.at[ridx,"rosettacode_tasks_count"]=r["rosettacode_tasks_count"]
+    # each title is resolved once; the fuzzy fallback reuses one key list
+    candidates = list(index[1].keys())
+    matches = {t: map_rosetta_to_master(t, index, candidates) for t in rc_df["rosettacode_name"]}
+
+    # when several titles land on one row the last (alphabetically) wins, as with row-by-row writes
+    hits = rc_df.assign(master_idx=rc_df["rosettacode_name"].map(matches)).dropna(subset=["master_idx"])
+    hits = hits.drop_duplicates("master_idx", keep="last")
+    ridx = hits["master_idx"].astype(int).to_numpy()
+    master.loc[ridx, "in_rosettacode"] = True
+    for col in ["rosettacode_name","rosettacode_url","rosettacode_summary","rosettacode_tasks_count"]:
+        master.loc[ridx, col] = hits[col].to_numpy()
 
     Path(args.out_csv).parent.mkdir(parents=True, exist_ok=True)
     master.to_csv(args.out_csv, index=False)
 
-    unmatched = rc_df[~rc_df["rosettacode_name"].map(lambda t: map_rosetta_to_master(t, index) is not None)]
+    unmatched = rc_df[rc_df["rosettacode_name"].map(matches).isna()]
     unmatched[["rosettacode_name","rosettacode_url"]].to_csv(args.missing_csv, index=False)
 
     print(f"[done] Rosetta languages (subcategories): {len(rc_df)}")
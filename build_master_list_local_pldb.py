@@ -20,10 +20,16 @@ Options:
 """
 
 import os, re, json, time, yaml, argparse, pathlib, hashlib, unicodedata
-from typing import Dict, List, Set
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Set, Tuple
+import numpy as np
 import requests, pandas as pd
-from bs4 import BeautifulSoup
-from rapidfuzz import fuzz
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html as lxhtml
+from rapidfuzz import fuzz, process
 
 # ----------------------------
 # Paths
@@ -35,22 +41,47 @@ RAW.mkdir(parents=True, exist_ok=True)
 DER.mkdir(parents=True, exist_ok=True)
 
 
+try:
+    STRING_DTYPE = pd.StringDtype(
+        "pyarrow"
+    )  # Arrow-backed strings, not PyObject* per cell
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+
+# libyaml-backed safe loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # ----------------------------
 # Normalization & IDs
 # ----------------------------
+# Compiled once; norm() runs for every row and alias of every source
+ID_STRIP_RE = re.compile(r"[^\w\s#+]")
+WS_RE = re.compile(r"\s+")
+
+
 def norm(s: str) -> str:
     if not s:
         return ""
     s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
     s = s.lower().strip()
     s = s.replace("♯", "#").replace("++", " plus plus ")
-    s = re.sub(r"[^\w\s#+]", " ", s)  # keep # and +
-    s = re.sub(r"\s+", " ", s)
+    s = ID_STRIP_RE.sub(" ", s)  # keep # and +
+    s = WS_RE.sub(" ", s)
     s = s.replace("#", " sharp ")
-    s = re.sub(r"\s+", "-", s).strip("-")
+    s = WS_RE.sub("-", s).strip("-")
     return s
 
 
+def to_string_dtype(df: pd.DataFrame) -> pd.DataFrame:
+    text_cols = [
+        c
+        for c, dt in df.dtypes.items()
+        if dt == object or isinstance(dt, pd.StringDtype)
+    ]
+    df[text_cols] = df[text_cols].astype(STRING_DTYPE)
+    return df
+
+
 def make_id(name: str) -> str:
     nid = norm(name or "")
     if nid:
@@ -83,6 +114,20 @@ def parse_args():
 
 HEADERS = {"User-Agent": "PL-ultimate/1.0 (+https://example.org)"}
 
+# One pooled keep-alive session (with retries) for every fetch in this script
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504)
+        ),
+    ),
+)
+
 
 # ----------------------------
 # Fetch sources (Linguist, Wikipedia, Esolang*)
@@ -92,9 +137,21 @@ def fetch_linguist(off=False) -> pathlib.Path:
     if off and out.exists():
         return out
     url = "https://raw.githubusercontent.com/github-linguist/linguist/master/lib/linguist/languages.yml"
-    r = requests.get(url, headers=HEADERS, timeout=60)
+    # conditional GET against the ETag of the copy we already have (304 -> keep it)
+    etag_p = out.with_suffix(".etag")
+    cond = {}
+    if out.exists() and etag_p.exists():
+        cond["If-None-Match"] = etag_p.read_text(encoding="utf-8").strip()
+    r = SESSION.get(url, headers=cond, timeout=60)
+    if r.status_code == 304 and cond:
+        return out
     r.raise_for_status()
     out.write_bytes(r.content)
+    etag = r.headers.get("ETag")
+    if etag:
+        etag_p.write_text(etag, encoding="utf-8")
+    else:
+        etag_p.unlink(missing_ok=True)
     return out
 
 
@@ -102,6 +159,12 @@ WIKI_BAD_PAT = re.compile(
     r"(list of|edits made from this ip address|disambiguation|help:|user:|talk:|wikipedia:)",
     re.IGNORECASE,
 )
+# title attributes of links in list columns, lists and tables, as plain strings
+WIKI_TITLE_XPATH = (
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' div-col ')]//li//a/@title"
+    " | //ul//li//a/@title | //table//a/@title"
+)
+WIKI_WORKERS = 6  # concurrent A-Z list pages; kept small to stay polite
 
 
 def fetch_wikipedia_titles(off=False) -> pathlib.Path:
@@ -113,29 +176,32 @@ def fetch_wikipedia_titles(off=False) -> pathlib.Path:
     try:
         base = "https://en.wikipedia.org/wiki/List_of_programming_languages"
 
-        def scrape(url: str):
-            html = requests.get(url, headers=HEADERS, timeout=60).text
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.select(
-                "div.div-col li a[title], ul li a[title], table a[title]"
-            ):
-                t = (a.get("title") or "").strip()
+        def scrape(url: str) -> Set[str]:
+            found: Set[str] = set()
+            tree = lxhtml.fromstring(SESSION.get(url, timeout=60).content)
+            for t in tree.xpath(WIKI_TITLE_XPATH):
+                t = t.strip()
                 if not t:
                     continue
                 if WIKI_BAD_PAT.search(t):  # noise guard
                     continue
-                titles.add(t)
-
-        scrape(base)
-        for L in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-            scrape(f"{base}:_{L}")
+                found.add(t)
             time.sleep(0.12)
+            return found
+
+        titles |= scrape(base)
+        # A-Z pages are independent; results are consumed in letter order, so a
+        # failure keeps the letters before it, as the sequential loop did
+        with ThreadPoolExecutor(max_workers=WIKI_WORKERS) as ex:
+            for found in ex.map(
+                scrape, [f"{base}:_{L}" for L in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+            ):
+                titles |= found
     except Exception:
         pass
 
     if not titles:
         # Category fallback (broader)
-        S = requests.Session()
         URL = "https://en.wikipedia.org/w/api.php"
         cont = None
         while True:
@@ -149,7 +215,7 @@ def fetch_wikipedia_titles(off=False) -> pathlib.Path:
             }
             if cont:
                 params["cmcontinue"] = cont
-            data = S.get(URL, params=params, headers=HEADERS, timeout=60).json()
+            data = SESSION.get(URL, params=params, timeout=60).json()
             for m in data["query"]["categorymembers"]:
                 t = m["title"].strip()
                 if not t or WIKI_BAD_PAT.search(t):
@@ -168,7 +234,6 @@ def fetch_esolang_titles(off=False) -> pathlib.Path:
     out = RAW / "esolang_language_titles.json"
     if off and out.exists():
         return out
-    S = requests.Session()
     URL = "https://esolangs.org/w/api.php"
     titles, cont = [], None
     while True:
@@ -181,7 +246,7 @@ def fetch_esolang_titles(off=False) -> pathlib.Path:
         }
         if cont:
             params["cmcontinue"] = cont
-        data = S.get(URL, params=params, headers=HEADERS, timeout=60).json()
+        data = SESSION.get(URL, params=params, timeout=60).json()
         titles += [p["title"] for p in data["query"]["categorymembers"]]
         cont = data.get("continue", {}).get("cmcontinue")
         if not cont:
@@ -207,6 +272,36 @@ BAD_PATH_TOKENS = re.compile(
 BAD_NAME_TOKENS = re.compile(
     r"^(authors?|build|books?|measures?|metrics?|readme|csv|tsv|json)\b", re.IGNORECASE
 )
+# Cheap pre-checks for the two patterns above. ASCII strings are decided without the
+# regex engine; anything else still goes through it (IGNORECASE folds e.g. "ſ" to "s").
+BAD_PATH_PARTS = frozenset(
+    "authors author build book books measure measures metric metrics script scripts "
+    "readme data csv tsv json asset assets".split()
+)
+BAD_NAME_PREFIXES = (
+    "author",
+    "build",
+    "book",
+    "measure",
+    "metric",
+    "readme",
+    "csv",
+    "tsv",
+    "json",
+)
+
+
+def _bad_path(pstr: str) -> bool:
+    if not BAD_PATH_PARTS.isdisjoint(pstr.lower().split("/")):
+        return True
+    return not pstr.isascii() and bool(BAD_PATH_TOKENS.search("/" + pstr + "/"))
+
+
+def _bad_name(name: str) -> bool:
+    if name.isascii() and not name.lower().startswith(BAD_NAME_PREFIXES):
+        return False
+    return bool(BAD_NAME_TOKENS.search(name))
+
 
 LANG_PROPS_HINTS = {
     "paradigm",
@@ -259,6 +354,11 @@ def parse_blocks(text: str) -> Dict[str, List[str]]:
     return props
 
 
+EXT_CLEAN_RE = re.compile(r"[^.\w+-]")
+EXT_SPLIT_RE = re.compile(r"[\s,;/]+")
+ALIAS_SPLIT_RE = re.compile(r"[|,;/]")
+
+
 def _norm_ext_token(tok: str) -> str:
     if not tok:
         return ""
@@ -266,7 +366,7 @@ def _norm_ext_token(tok: str) -> str:
     tok = tok.lstrip("*")
     if not tok.startswith("."):
         tok = "." + tok
-    tok = re.sub(r"[^.\w+-]", "", tok.lower())
+    tok = EXT_CLEAN_RE.sub("", tok.lower())
     return tok
 
 
@@ -275,7 +375,7 @@ def _collect_pldb_extensions(props: Dict[str, List[str]]) -> List[str]:
     # clocExtensions variants
     for key in ("clocextensions", "cloc extensions", "cloc-ext", "cloc_ext"):
         for val in props.get(key, []):
-            parts = re.split(r"[\s,;/]+", val) if isinstance(val, str) else [val]
+            parts = EXT_SPLIT_RE.split(val) if isinstance(val, str) else [val]
             for p in parts:
                 e = _norm_ext_token(str(p))
                 if len(e) > 1:
@@ -288,7 +388,7 @@ def _collect_pldb_extensions(props: Dict[str, List[str]]) -> List[str]:
         "extensions",
     ):
         for val in props.get(key, []):
-            parts = re.split(r"[\s,;/]+", val) if isinstance(val, str) else [val]
+            parts = EXT_SPLIT_RE.split(val) if isinstance(val, str) else [val]
             for p in parts:
                 e = _norm_ext_token(str(p))
                 if len(e) > 1:
@@ -296,11 +396,35 @@ def _collect_pldb_extensions(props: Dict[str, List[str]]) -> List[str]:
     return sorted(exts)
 
 
+# Property key variants, in lookup order
+NAME_KEYS = ("name", "title")
+PARADIGM_KEYS = ("paradigm", "paradigms")
+TYPING_KEYS = ("typing", "type system")
+DESIGNED_BY_KEYS = ("designed by", "designed")
+INFLUENCED_BY_KEYS = ("influenced by", "influenced", "influenced-by")
+HELLO_WORLD_KEYS = ("hello world", "hello-world", "hello_world", "hello")
+FIRST_APPEARED_KEYS = ("appeared", "first appeared", "first-appeared")
+HOMEPAGE_KEYS = ("homepage", "home page", "url", "urls")
+
+
+def _mget(props: Dict[str, List[str]], keys: Tuple[str, ...]) -> Iterator[str]:
+    # values of every key variant, in key order, without building lists
+    return chain.from_iterable(props.get(k, ()) for k in keys)
+
+
+def _first(props: Dict[str, List[str]], keys: Tuple[str, ...]) -> str:
+    # first value of the first non-empty key variant
+    for k in keys:
+        if props.get(k):
+            return props[k][0].strip()
+    return ""
+
+
 def parse_pldb_file(text: str, file_path: pathlib.Path) -> dict:
     pstr = file_path.as_posix()
 
     # 1) quick path filter for obvious non-language utility dirs
-    if BAD_PATH_TOKENS.search("/" + pstr + "/"):
+    if _bad_path(pstr):
         return {}
 
     props = parse_blocks(text)
@@ -316,45 +440,23 @@ def parse_pldb_file(text: str, file_path: pathlib.Path) -> dict:
         return {}
 
     # 4) name/title or fallback to filename stem (avoid generic/bad stems)
-    name = None
-    for key in ("name", "title"):
-        if props.get(key):
-            name = props[key][0].strip()
-            break
+    name = _first(props, NAME_KEYS)
     if not name:
         name = file_path.stem.strip()
-    if not name or BAD_NAME_TOKENS.search(name):
+    if not name or _bad_name(name):
         return {}
 
     # metadata fields
-    paradigms = "; ".join(props.get("paradigm", []) + props.get("paradigms", []))
-    typing = "; ".join(props.get("typing", []) + props.get("type system", []))
-    designed_by = "; ".join(props.get("designed by", []) + props.get("designed", []))
-    influenced_by = "; ".join(
-        props.get("influenced by", [])
-        + props.get("influenced", [])
-        + props.get("influenced-by", [])
-    )
-    hello_world = bool(
-        props.get("hello world")
-        or props.get("hello-world")
-        or props.get("hello_world")
-        or props.get("hello")
-    )
+    paradigms = "; ".join(_mget(props, PARADIGM_KEYS))
+    typing = "; ".join(_mget(props, TYPING_KEYS))
+    designed_by = "; ".join(_mget(props, DESIGNED_BY_KEYS))
+    influenced_by = "; ".join(_mget(props, INFLUENCED_BY_KEYS))
+    hello_world = any(props.get(k) for k in HELLO_WORLD_KEYS)
 
     exts = " ".join(_collect_pldb_extensions(props))
 
-    first_appeared = ""
-    for key in ("appeared", "first appeared", "first-appeared"):
-        if props.get(key):
-            first_appeared = props[key][0].strip()
-            break
-
-    homepage = ""
-    for key in ("homepage", "home page", "url", "urls"):
-        if props.get(key):
-            homepage = props[key][0].strip()
-            break
+    first_appeared = _first(props, FIRST_APPEARED_KEYS)
+    homepage = _first(props, HOMEPAGE_KEYS)
 
     return {
         "name": name,
@@ -382,27 +484,33 @@ def _collect_aliases(props: Dict[str, List[str]]) -> List[str]:
     ):
         for val in props.get(key, []):
             if any(sep in val for sep in [",", "|", ";"]):
-                aliases += [x.strip() for x in re.split(r"[|,;/]", val) if x.strip()]
+                aliases += [x.strip() for x in ALIAS_SPLIT_RE.split(val) if x.strip()]
             else:
                 aliases.append(val.strip())
-    aliases = sorted(set(a for a in aliases if a and not BAD_NAME_TOKENS.search(a)))
+    aliases = sorted(set(a for a in aliases if a and not _bad_name(a)))
     return aliases
 
 
+# .pldb / .scroll in any letter case, matched by the directory walk itself
+PLDB_GLOBS = ("*.[pP][lL][dD][bB]", "*.[sS][cC][rR][oO][lL][lL]")
+
+
+def parse_one(p: pathlib.Path) -> dict:
+    # top-level so worker processes can unpickle it
+    try:
+        text = p.read_bytes().decode("utf-8", "ignore")
+    except Exception:
+        return {}
+    return parse_pldb_file(text, p)
+
+
 def scan_local_pldb(pldb_dir: pathlib.Path) -> list:
-    files = 0
-    langs = []
-    for p in pldb_dir.rglob("*"):
-        if p.suffix.lower() not in (".pldb", ".scroll"):
-            continue
-        files += 1
-        try:
-            text = p.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-        rec = parse_pldb_file(text, p)
-        if rec:
-            langs.append(rec)
+    # sorted, so which duplicate file wins downstream no longer depends on readdir order
+    paths = sorted(chain.from_iterable(pldb_dir.rglob(g) for g in PLDB_GLOBS))
+    files = len(paths)
+    # ordered imap keeps that order while files are parsed on every core
+    with Pool() as pool:
+        langs = [rec for rec in pool.imap(parse_one, paths, chunksize=64) if rec]
     print(
         f"[info] PLDB files scanned: {files}, languages detected: {len(langs)} (PLDB=truth)"
     )
@@ -412,49 +520,42 @@ def scan_local_pldb(pldb_dir: pathlib.Path) -> list:
 # ----------------------------
 # Enrichment (merge extensions with Linguist)
 # ----------------------------
-def enrich_extensions_from_linguist(df: pd.DataFrame) -> pd.DataFrame:
-    df_l = df[df["source_flags"].str.contains("linguist", na=False)].copy()
-    key_to_ext = {
-        r["linguist_key"]: r.get("extensions", "") for _, r in df_l.iterrows()
-    }
-    name_to_key = {r["canonical_name"]: r["linguist_key"] for _, r in df_l.iterrows()}
-    linguist_names = set(df_l["canonical_name"].astype(str))
-
-    def _merge_ext(existing: str, extra: str) -> str:
-        a = set((existing or "").split())
-        b = set((extra or "").split())
-        merged = " ".join(sorted((a | b) - {""}))
-        return merged
-
-    # exact canonical name
-    hit_mask = df["canonical_name"].astype(str).isin(linguist_names)
-    df.loc[hit_mask, "linguist_key"] = df.loc[hit_mask, "canonical_name"].map(
-        name_to_key
-    )
-    df.loc[hit_mask, "extensions"] = [
-        _merge_ext(e, key_to_ext.get(k, ""))
-        for e, k in zip(
-            df.loc[hit_mask, "extensions"], df.loc[hit_mask, "linguist_key"]
-        )
-    ]
+def _merge_ext(existing: pd.Series, extra: pd.Series) -> pd.Series:
+    # row-wise sorted union of two space-separated extension lists
+    toks = (existing.fillna("") + " " + extra.fillna("")).str.split().explode().dropna()
+    toks = toks.rename("ext").rename_axis("row").reset_index().drop_duplicates()
+    merged = toks.sort_values(["row", "ext"]).groupby("row")["ext"].agg(" ".join)
+    return merged.reindex(existing.index, fill_value="")
 
-    # normalized id
-    df_l_ids = set(df_l["lang_id"])
-    hit_mask2 = df["lang_id"].isin(df_l_ids)
-    id_to_key = {r["lang_id"]: r["linguist_key"] for _, r in df_l.iterrows()}
-    df.loc[hit_mask2, "linguist_key"] = df.loc[hit_mask2, "lang_id"].map(id_to_key)
-    df.loc[hit_mask2, "extensions"] = [
-        _merge_ext(e, key_to_ext.get(k, ""))
-        for e, k in zip(
-            df.loc[hit_mask2, "extensions"], df.loc[hit_mask2, "linguist_key"]
+
+def enrich_extensions_from_linguist(df: pd.DataFrame) -> pd.DataFrame:
+    df_l = df[df["source_flags"].str.contains("linguist", na=False)]
+
+    # lookups keyed like the old dict comprehensions: last row wins on repeats
+    def _lookup(key: str, val: str) -> pd.Series:
+        return df_l.drop_duplicates(key, keep="last").set_index(key)[val]
+
+    key_to_ext = _lookup("linguist_key", "extensions")
+
+    # exact canonical name, then normalized id
+    for col in ["canonical_name", "lang_id"]:
+        to_key = _lookup(col, "linguist_key")
+        hit_mask = df[col].isin(to_key.index)
+        keys = df.loc[hit_mask, col].map(to_key)
+        df.loc[hit_mask, "linguist_key"] = keys
+        df.loc[hit_mask, "extensions"] = _merge_ext(
+            df.loc[hit_mask, "extensions"], keys.map(key_to_ext)
         )
-    ]
 
     # mark flags for enriched rows
-    for idx in df.index[df["linguist_key"].notna() & (df["linguist_key"] != "")]:
-        flags = set((df.at[idx, "source_flags"] or "").split(";"))
-        flags.add("linguist")
-        df.at[idx, "source_flags"] = ";".join(sorted(x for x in flags if x))
+    mask = df["linguist_key"].notna() & (df["linguist_key"] != "")
+    flags = df.loc[mask, "source_flags"].fillna("")
+    # few distinct flag strings: normalize each once, then map
+    with_ling = {
+        f: ";".join(sorted({x for x in f.split(";") if x} | {"linguist"}))
+        for f in flags.unique()
+    }
+    df.loc[mask, "source_flags"] = flags.map(with_ling)
     return df
 
 
@@ -483,7 +584,7 @@ def main():
     rows, alias_rows = [], []
 
     # Linguist
-    ling = yaml.safe_load(ling_p.read_text(encoding="utf-8"))
+    ling = yaml.load(ling_p.read_bytes(), Loader=YAML_LOADER)
     print(f"[info] Linguist entries: {len(ling)}")
     for name, meta in ling.items():
         nid = make_id(name)
@@ -588,25 +689,24 @@ def main():
             alias_rows.append({"alias": a, "lang_id": nid, "source": "pldb"})
 
     # DataFrame + enrichment
-    df = pd.DataFrame(rows)
+    df = to_string_dtype(pd.DataFrame(rows))
     df = enrich_extensions_from_linguist(df)
+    # a handful of distinct values repeated on every row: store them as codes
+    for c in ["source_flags", "evidence_urls", "linguist_key"]:
+        df[c] = df[c].fillna("").astype("category")
 
     # Derived booleans & counts for post-analysis
-    df["in_pldb"] = df["source_flags"].str.contains(r"\bpldb\b", na=False)
-    df["in_linguist"] = df["source_flags"].str.contains(r"\blinguist\b", na=False)
-    df["in_wikipedia"] = df["source_flags"].str.contains(r"\bwikipedia\b", na=False)
-    df["in_esolang"] = df["source_flags"].str.contains(r"\besolang\b", na=False)
+    # (the four flag names are not substrings of one another, so a plain find is exact)
+    for flag in ["pldb", "linguist", "wikipedia", "esolang"]:
+        df[f"in_{flag}"] = df["source_flags"].str.contains(flag, regex=False, na=False)
 
     df["has_extensions"] = df["extensions"].fillna("").str.len() > 0
     df["has_paradigm"] = df["paradigms"].fillna("").str.len() > 0
     df["has_typing"] = df["typing"].fillna("").str.len() > 0
     df["has_hello_world"] = df["hello_world"].fillna(False).astype(bool)
 
-    df["source_count"] = (
-        df["source_flags"]
-        .fillna("")
-        .apply(lambda s: len([x for x in s.split(";") if x.strip()]))
-    )
+    # ;-separated pieces that are not blank
+    df["source_count"] = df["source_flags"].str.count(r"[^;]*[^;\s][^;]*").astype(int)
 
     # Merge helpers
     def merge_flags(col):
@@ -669,59 +769,58 @@ def main():
         for _, r in dfm.iterrows()
         if isinstance(r["lang_id"], str) and r["lang_id"]
     ]
-    df_alias = pd.DataFrame(alias_rows).dropna().drop_duplicates()
+    df_alias = to_string_dtype(pd.DataFrame(alias_rows).dropna().drop_duplicates())
     alias_counts = df_alias.groupby("lang_id").size().rename("alias_count")
-    dfm = (
-        dfm.merge(alias_counts, on="lang_id", how="left")
-        .fillna({"alias_count": 0})
-        .copy()
-    )
+    # both sides are keyed by unique lang_id; validate guards that invariant
+    dfm = dfm.merge(
+        alias_counts, on="lang_id", how="left", validate="one_to_one"
+    ).fillna({"alias_count": 0})
     dfm["alias_count"] = dfm["alias_count"].astype(int)
 
-    # Conservative fuzzy collapse
+    # Conservative fuzzy collapse (only ids sharing a first character are compared)
     ids = [i for i in dfm["lang_id"].astype(str).tolist() if i]
     id_map = {i: i for i in ids}
-    for i in range(len(ids)):
-        a = ids[i]
-        for j in range(i + 1, len(ids)):
-            b = ids[j]
-            if not a or not b:
-                continue
-            if a[0] != b[0]:
-                continue
-            if fuzz.ratio(a, b) >= 94:
-                sa = len(
-                    (dfm.loc[dfm.lang_id == a, "source_flags"].values or [""])[0].split(
-                        ";"
-                    )
-                )
-                sb = len(
-                    (dfm.loc[dfm.lang_id == b, "source_flags"].values or [""])[0].split(
-                        ";"
-                    )
-                )
-                keep, drop = (a, b) if sa >= sb else (b, a)
-                id_map[drop] = keep
+    srccnt = dict(
+        zip(dfm["lang_id"], dfm["source_flags"].fillna("").str.count(";") + 1)
+    )
+    buckets: Dict[str, List[str]] = {}
+    for i in ids:
+        buckets.setdefault(i[0], []).append(i)
+    for bucket in buckets.values():
+        if len(bucket) < 2:
+            continue
+        scores = process.cdist(
+            bucket,
+            bucket,
+            scorer=fuzz.ratio,
+            score_cutoff=94,
+            dtype=np.uint8,
+            workers=-1,
+        )
+        # upper triangle, row-major: same (i < j) pair order as a nested loop
+        for i, j in np.argwhere(np.triu(scores >= 94, k=1)):
+            a, b = bucket[i], bucket[j]
+            keep, drop = (a, b) if srccnt[a] >= srccnt[b] else (b, a)
+            id_map[drop] = keep
 
     if set(id_map.values()) != set(ids):
-        dfm["lang_id"] = dfm["lang_id"].map(id_map)
-        dfm = dfm.groupby("lang_id", as_index=False).agg(agg)
+        old_ids = dfm["lang_id"]
+        dfm["lang_id"] = old_ids.map(id_map)
         df_alias["lang_id"] = df_alias["lang_id"].map(lambda x: id_map.get(x, x))
         df_alias = df_alias.drop_duplicates()
         alias_counts = df_alias.groupby("lang_id").size().rename("alias_count")
+        # only renamed or merged groups are re-aggregated; the rest are already final
+        hit = dfm["lang_id"].ne(old_ids) | dfm["lang_id"].duplicated(keep=False)
+        merged = dfm[hit].groupby("lang_id", as_index=False).agg(agg)
+        merged["alias_count"] = (
+            merged["lang_id"].map(alias_counts).fillna(0).astype(int)
+        )
         dfm = (
-            dfm.merge(alias_counts, on="lang_id", how="left")
-            .fillna({"alias_count": 0})
-            .copy()
+            pd.concat([dfm[~hit], merged]).sort_values("lang_id").reset_index(drop=True)
         )
-        dfm["alias_count"] = dfm["alias_count"].astype(int)
 
-    DER.joinpath("languages_master.csv").write_text(
-        dfm.to_csv(index=False), encoding="utf-8"
-    )
-    DER.joinpath("aliases.csv").write_text(
-        df_alias.to_csv(index=False), encoding="utf-8"
-    )
+    dfm.to_csv(DER / "languages_master.csv", index=False, encoding="utf-8")
+    df_alias.to_csv(DER / "aliases.csv", index=False, encoding="utf-8")
     print("Wrote:", DER / "languages_master.csv", "and", DER / "aliases.csv")
 
 
@@ -8,50 +8,55 @@ OUT = DER / "extensions_inventory.csv"
 VALID_EXT = re.compile(r"^\.[A-Za-z0-9_+-]+$")
 
 
-def split_exts(s: str):
-    if not isinstance(s, str):
-        return []
-    toks = [t for t in s.strip().split() if t]
-    toks = [t if t.startswith(".") else f".{t}" for t in toks]
-    toks = [t.lower() for t in toks if VALID_EXT.match(t)]
-    return toks
+FLAGS = ["pldb", "linguist", "wikipedia", "esolang"]
+
+
+USECOLS = ["lang_id", "canonical_name", "extensions", "source_flags"]
+
+
+def read_master(path: pathlib.Path) -> pd.DataFrame:
+    # only the columns used here, as strings; pyarrow's parser when available
+    kw = dict(usecols=USECOLS, dtype={c: "string" for c in USECOLS})
+    try:
+        return pd.read_csv(path, engine="pyarrow", **kw)
+    except (ImportError, ValueError):
+        return pd.read_csv(path, **kw)
+
+
+def explode_exts(df: pd.DataFrame) -> pd.DataFrame:
+    # one row per (language, valid extension), in master order
+    dx = (
+        df[["lang_id", "canonical_name", "source_flags"]]
+        .assign(extension=df["extensions"].astype(object).str.split())
+        .explode("extension")
+        .dropna(subset=["extension"])
+    )
+    ext = dx["extension"]
+    ext = ext.where(ext.str.startswith("."), "." + ext)
+    dx = dx.assign(extension=ext)[ext.str.match(VALID_EXT)]
+    dx["extension"] = dx["extension"].str.lower()
+    flags = dx.pop("source_flags").fillna("")
+    for f in FLAGS:
+        dx[f"in_{f}"] = flags.str.contains(rf"(?:^|;){f}(?:;|$)")
+    return dx.reset_index(drop=True)
 
 
 def main():
     if not INP.exists():
         raise SystemExit(f"Missing {INP}. Run make build first.")
 
-    df = pd.read_csv(INP)
+    df = read_master(INP)
 
     # explode extensions
-    rows = []
-    for _, r in df.iterrows():
-        exts = split_exts(r.get("extensions", ""))
-        if not exts:
-            continue
-        flags = set((r.get("source_flags", "") or "").split(";"))
-        for ext in exts:
-            rows.append(
-                {
-                    "extension": ext,
-                    "lang_id": r["lang_id"],
-                    "canonical_name": r["canonical_name"],
-                    "in_pldb": "pldb" in flags,
-                    "in_linguist": "linguist" in flags,
-                    "in_wikipedia": "wikipedia" in flags,
-                    "in_esolang": "esolang" in flags,
-                }
-            )
-
-    if not rows:
+    dx = explode_exts(df)
+
+    if dx.empty:
         print("[warn] No extensions found in languages_master.csv.")
         OUT.write_text(
             "extension,count_total,count_pldb,count_linguist,count_wikipedia,count_esolang,sample_lang\n"
         )
         return
 
-    dx = pd.DataFrame(rows)
-
     # aggregate counts
     agg = (
         dx.groupby("extension")
@@ -1,100 +1,100 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import re, argparse, difflib
+import re, csv, argparse
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
+from rapidfuzz import fuzz, process
 
+WS_RE = re.compile(r"\s+")
+KEY_STRIP_RE = re.compile(r"[^a-z0-9+#.\- ]+")
+PUNCT_TR = str.maketrans({"–":"-","—":"-","’":"'","“":'"',"”":'"'})
+
+# pure and called on heavily repeated strings (every cell piece), so memoized
+@lru_cache(maxsize=100_000)
 def normalize_token(s: str) -> str:
     s = (s or "").strip()
-    s = s.replace("–","-").replace("—","-").replace("’","'").replace("“",'"').replace("”",'"')
-    s = re.sub(r"\s+"," ",s)
+    s = s.translate(PUNCT_TR)
+    s = WS_RE.sub(" ",s)
     return s
 
+@lru_cache(maxsize=100_000)
 def normalize_key(s: str) -> str:
     s = normalize_token(s).lower()
-    s = re.sub(r"[^a-z0-9+#.\- ]+","",s)
+    s = KEY_STRIP_RE.sub("",s)
     return s.strip()
 
-def alias_map() -> Dict[str,str]:
-    return {
-        "c sharp":"c#", "c-sharp":"c#", "csharp":"c#",
-        "f sharp":"f#","f-sharp":"f#","fsharp":"f#",
-        "c plus plus":"c++","cplusplus":"c++","cpp":"c++",
-        "objective c":"objective-c","obj-c":"objective-c",
-        "objective c++":"objective-c++","obj-c++":"objective-c++",
-        "golang":"go",
-        "js":"javascript","ts":"typescript",
-        "vb.net":"visual basic .net","vb":"visual basic .net","visual basic":"visual basic .net",
-        "ocaml":"ocaml","objective caml":"ocaml",
-        "vim script":"vim script","vimscript":"vim script",
-        "wolfram language":"mathematica","wolfram":"mathematica",
-        "rstats":"r",
-        "yml":"yaml",
-        "jsonc":"json","json5":"json",
-        "pl/sql":"plsql","pl-sql":"plsql",
-        "pl/pgsql":"plpgsql",
-        "powershell":"powershell",
-    }
-
-def _tokenize_pieces(s: str):
-    yield s
+ALIAS_MAP = {
+    "c sharp":"c#", "c-sharp":"c#", "csharp":"c#",
+    "f sharp":"f#","f-sharp":"f#","fsharp":"f#",
+    "c plus plus":"c++","cplusplus":"c++","cpp":"c++",
+    "objective c":"objective-c","obj-c":"objective-c",
+    "objective c++":"objective-c++","obj-c++":"objective-c++",
+    "golang":"go",
+    "js":"javascript","ts":"typescript",
+    "vb.net":"visual basic .net","vb":"visual basic .net","visual basic":"visual basic .net",
+    "ocaml":"ocaml","objective caml":"ocaml",
+    "vim script":"vim script","vimscript":"vim script",
+    "wolfram language":"mathematica","wolfram":"mathematica",
+    "rstats":"r",
+    "yml":"yaml",
+    "jsonc":"json","json5":"json",
+    "pl/sql":"plsql","pl-sql":"plsql",
+    "pl/pgsql":"plpgsql",
+    "powershell":"powershell",
+}
+
+@lru_cache(maxsize=100_000)
+def canonical_key(s: str) -> str:
+    # spaces and dashes dropped, so "c sharp", "c-sharp" and "csharp" share one key
+    return normalize_key(s).replace(" ", "").replace("-", "")
+
+def build_master_index_all_strings(df: pd.DataFrame) -> Tuple[Dict[str,int], Dict[str,int]]:
+    # Pieces of every non-blank cell: the whole string, its ;,|/\\ parts and its _/- parts.
+    # Returns (exact, canonical) indexes: each normalize_key/canonical_key of a piece, and of its
+    # alias, maps to the first row that yields it.
+    flat = df.reset_index(drop=True)
+    cells = pd.concat([flat[col].dropna().astype(str) for col in flat.columns])
+    cells = cells[cells.str.strip() != ""]
+    parts = [cells]
     for sep in [';', ',', '|', '/', '\\']:
-        if sep in s:
-            for part in s.split(sep):
-                part = part.strip()
-                if part:
-                    yield part
-    if any(ch in s for ch in ['_', '-']):
-        for part in re.split(r'[_-]+', s):
-            part = part.strip()
-            if part:
-                yield part
-
-def _variants(key: str):
-    yield key
-    yield key.replace(' ', '-')
-    yield key.replace('-', ' ')
-    yield key.replace(' ', '')
-    yield key.replace('-', '')
-
-def build_master_index_all_strings(df: pd.DataFrame) -> Dict[str,int]:
-    idx = {}
-    am = alias_map()
-    for ridx, row in df.iterrows():
-        for col in df.columns:
-            val = row[col]
-            if pd.isna(val):
-                continue
-            s = str(val)
-            if not s.strip():
-                continue
-            for piece in _tokenize_pieces(s):
-                key = normalize_key(piece)
-                if not key:
-                    continue
-                for v in _variants(key):
-                    idx.setdefault(v, ridx)
-                ali = am.get(key)
-                if ali:
-                    for v in _variants(ali):
-                        idx.setdefault(v, ridx)
-    return idx
-
-def map_rosetta_to_master(name: str, index: Dict[str,int]) -> Optional[int]:
+        hit = cells[cells.str.contains(sep, regex=False)]
+        parts.append(hit.str.split(sep, regex=False).explode().str.strip())
+    hit = cells[cells.str.contains(r'[_-]', regex=True)]
+    parts.append(hit.str.split(r'[_-]+', regex=True).explode().str.strip())
+    pieces = pd.concat(parts)
+    pieces = pieces[pieces != ""]
+
+    # normalize each distinct piece once
+    first = pd.DataFrame({"piece": pieces.to_numpy(), "row": pieces.index}).groupby("piece")["row"].min()
+    keys = pd.DataFrame({"key": first.index.map(normalize_key), "row": first.to_numpy()})
+    keys = keys[keys["key"] != ""]
+    ali = keys["key"].map(ALIAS_MAP).dropna()
+    keys = pd.concat([keys, pd.DataFrame({"key": ali, "row": keys.loc[ali.index, "row"]})])
+
+    def first_rows(k: pd.Series) -> Dict[str,int]:
+        best = keys["row"].groupby(k.to_numpy()).min()
+        return dict(zip(best.index, df.index[best.to_numpy()].tolist()))
+    return first_rows(keys["key"]), first_rows(keys["key"].str.replace(" ", "", regex=False).str.replace("-", "", regex=False))
+
+def _fuzzy(key: str, index: Dict[str,int], candidates: Optional[List[str]] = None) -> Optional[int]:
+    if candidates is None: candidates = list(index.keys())
+    best = process.extractOne(key, candidates, scorer=fuzz.ratio, score_cutoff=92)
+    return index[best[0]] if best else None
+
+def map_rosetta_to_master(name: str, index: Tuple[Dict[str,int], Dict[str,int]],
+                          candidates: Optional[List[str]] = None) -> Optional[int]:
+    exact, canon = index
     key = normalize_key(name)
-    if key in index:
-        return index[key]
-    ali = alias_map().get(key, key)
-    for v in _variants(ali):
-        if v in index:
-            return index[v]
-    # fuzzy last resort
-    candidates = list(index.keys())
-    best = difflib.get_close_matches(ali, candidates, n=1, cutoff=0.92)
-    if best:
-        return index[best[0]]
-    return None
+    ali = ALIAS_MAP.get(key, key)
+    for k in (key, ali):
+        if k in exact: return exact[k]
+    # spelling variants ("c sharp" / "c-sharp" / "csharp") all meet on the canonical key
+    ckey = canonical_key(ali)
+    if ckey in canon: return canon[ckey]
+    # fuzzy last resort, over the canonical keys as in augment_with_rosettacode
+    return _fuzzy(ckey, canon, candidates)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -103,30 +103,38 @@ def main():
     ap.add_argument("--out", default="data/derived/rosettacode_match_details.csv")
     args = ap.parse_args()
 
-    master = pd.read_csv(args.master)
-    rc = pd.read_csv(args.rc)
+    master = pd.read_csv(args.master, dtype=str)
 
     index = build_master_index_all_strings(master)
+    # the fuzzy fallback reuses one key list instead of copying the index per miss
+    candidates = list(index[1].keys())
+    # the result depends only on the normalized name, and RC repeats some under several titles
+    resolved: Dict[str, Optional[int]] = {}
 
-    rows = []
-    for _, r in rc.iterrows():
-        rc_name = r.get("rosettacode_name") or r.get("name") or ""
-        rc_url  = r.get("rosettacode_url") or ""
-        ridx = map_rosetta_to_master(str(rc_name), index)
-        rows.append({
-            "rosettacode_name": rc_name,
-            "rosettacode_url": rc_url,
-            "matched": ridx is not None,
-            "master_row_index": int(ridx) if ridx is not None else None,
-        })
-
-    outdf = pd.DataFrame(rows)
+    # rows are written as they are resolved; only the ALGOL peek is kept in memory
+    cols = ["rosettacode_name", "rosettacode_url", "matched", "master_row_index"]
+    peek = []
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    outdf.to_csv(args.out, index=False)
+    with open(args.rc, newline="", encoding="utf-8") as f, \
+         open(args.out, "w", newline="", encoding="utf-8") as g:
+        w = csv.writer(g, lineterminator="\n")
+        w.writerow(cols)
+        # "name" is an older spelling of rosettacode_name
+        for r in csv.DictReader(f):
+            rc_name = r.get("rosettacode_name") or r.get("name") or ""
+            rc_url  = r.get("rosettacode_url") or ""
+            nk = normalize_key(str(rc_name))
+            if nk not in resolved:
+                resolved[nk] = map_rosetta_to_master(str(rc_name), index, candidates)
+            ridx = resolved[nk]
+            # float, as pandas wrote this blank-holding column ("2356.0")
+            row = [rc_name, rc_url, ridx is not None, float(ridx) if ridx is not None else ""]
+            w.writerow(row)
+            if "algol" in str(rc_name).lower():
+                peek.append(row[:3] + [ridx])
 
-    peek = outdf[outdf["rosettacode_name"].str.contains("ALGOL", case=False, na=False)]
-    if not peek.empty:
-        print(peek.to_string(index=False)[:1000])
+    if peek:
+        print(pd.DataFrame(peek, columns=cols).to_string(index=False)[:1000])
 
 if __name__ == "__main__":
     main()
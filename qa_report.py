@@ -5,18 +5,43 @@ DER = pathlib.Path("data/derived")
 RAW = pathlib.Path("data/raw")
 
 
-def load_csv(name):
+BOOL_COLS = [
+    "in_pldb",
+    "in_linguist",
+    "in_wikipedia",
+    "in_esolang",
+    "has_extensions",
+    "has_paradigm",
+    "has_typing",
+    "has_hello_world",
+]
+# languages_master columns the report touches; text as str, flags cast after load
+LM_COLS = ["lang_id", "canonical_name", "source_flags", "extensions"] + BOOL_COLS
+LM_DTYPES = {
+    c: str for c in ["lang_id", "canonical_name", "source_flags", "extensions"]
+}
+
+
+def load_csv(name, **kw):
     p = DER / name
     if not p.exists():
         print(f"[err] Missing {p}")
         return None
     try:
-        return pd.read_csv(p)
+        return pd.read_csv(p, **kw)
     except Exception as e:
         print(f"[err] Failed to read {p}: {e}")
         return None
 
 
+def flag_mask(lm, flag):
+    # the build's in_<flag> column when present, else a scan of source_flags
+    col = f"in_{flag}"
+    if col in lm.columns:
+        return lm[col]
+    return lm["source_flags"].fillna("").str.contains(flag, regex=False)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument(
@@ -24,22 +49,23 @@ def main():
     )
     args = ap.parse_args()
 
-    lm = load_csv("languages_master.csv")
-    al = load_csv("aliases.csv")
+    lm = load_csv(
+        "languages_master.csv", usecols=lambda c: c in LM_COLS, dtype=LM_DTYPES
+    )
+    al = load_csv("aliases.csv", usecols=[0])  # only its length is reported
     if lm is None or al is None:
         return
+    # blanks would leave these as object columns; one cast keeps every mask a numpy bool op
+    for c in BOOL_COLS:
+        if c in lm.columns:
+            lm[c] = lm[c].notna() & lm[c].astype(bool)  # blank -> False
 
     print(f"[ok] languages_master rows: {len(lm)}")
     print(f"[ok] aliases rows: {len(al)}")
 
     # Coverage by source
-    src_counts = {}
-    for s in lm["source_flags"].fillna(""):
-        for flag in s.split(";"):
-            flag = flag.strip()
-            if not flag:
-                continue
-            src_counts[flag] = src_counts.get(flag, 0) + 1
+    flags = lm["source_flags"].fillna("").str.split(";").explode().str.strip()
+    src_counts = flags[flags != ""].value_counts().to_dict()
     print("[info] Source coverage:")
     for k in sorted(src_counts):
         print(f"  - {k:9s}: {src_counts[k]}")
@@ -48,16 +74,7 @@ def main():
         return
 
     # Booleans summary
-    for col in [
-        "in_pldb",
-        "in_linguist",
-        "in_wikipedia",
-        "in_esolang",
-        "has_extensions",
-        "has_paradigm",
-        "has_typing",
-        "has_hello_world",
-    ]:
+    for col in BOOL_COLS:
         if col in lm.columns:
             print(f"[info] {col}: {lm[col].sum()}")
 
@@ -79,24 +96,24 @@ def main():
 
     # Peeks
     for flag in ["pldb", "linguist", "wikipedia", "esolang"]:
-        subset = lm[lm["source_flags"].fillna("").str.contains(flag)]
+        subset = lm[flag_mask(lm, flag)]
         print(f"[peek] {flag} ({len(subset)} rows):")
         if len(subset) == 0:
             print("  (none)")
         else:
-            for _, r in subset.head(5).iterrows():
-                print(
-                    f"  - {r['canonical_name']} | id={r['lang_id']} | flags={r['source_flags']} | ext={r.get('extensions', '')}"
-                )
+            peek = subset[["canonical_name", "lang_id", "source_flags", "extensions"]]
+            for cn, lid, sf, ext in peek.head(5).itertuples(index=False, name=None):
+                print(f"  - {cn} | id={lid} | flags={sf} | ext={ext}")
 
     # No-extension examples (to inspect)
     unext = lm[
         (lm["extensions"].fillna("") == "")
-        & lm["source_flags"].str.contains("pldb|wikipedia", na=False)
+        & (flag_mask(lm, "pldb") | flag_mask(lm, "wikipedia"))
     ]
     print("[peek] No-extension examples (pldb|wikipedia):")
-    for _, r in unext.head(10).iterrows():
-        print(f"  - {r['canonical_name']} | flags={r['source_flags']}")
+    peek = unext[["canonical_name", "source_flags"]]
+    for cn, sf in peek.head(10).itertuples(index=False, name=None):
+        print(f"  - {cn} | flags={sf}")
 
     # High-signal PLs for refined views (examples)
     if all(